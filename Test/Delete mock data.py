@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine, text
+from datetime import datetime
+from sqlalchemy import create_engine, text, bindparam
+from sqlalchemy.types import DateTime
 from urllib.parse import quote_plus
 
 # --- CONFIG ---
@@ -12,42 +14,60 @@ DB_TABLE = "ThermalReadings"
 DELETE_FROM_DATE = "2025-01-1 00:00:00"
 DELETE_END_DATE  = "2026-01-11 23:59:59"
 
+# Rows removed per committed batch
+DELETE_BATCH_SIZE = 50000
+
 def delete_range_records():
     # 1. Setup Connection
     encoded_pass = quote_plus(DB_PASS)
     db_url = f"mssql+pyodbc://{DB_USER}:{encoded_pass}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
     engine = create_engine(db_url)
 
+    # Typed DATETIME parameters + a closed BETWEEN range let SQL Server
+    # seek on Timestamp instead of converting string literals per row
+    range_params = (bindparam("start_date", type_=DateTime), bindparam("end_date", type_=DateTime))
+    params = {
+        "start_date": datetime.strptime(DELETE_FROM_DATE, "%Y-%m-%d %H:%M:%S"),
+        "end_date": datetime.strptime(DELETE_END_DATE, "%Y-%m-%d %H:%M:%S"),
+    }
+
     try:
+        # 2. Preview how many records match the range
         with engine.connect() as conn:
-            # 2. Check how many records match the range
             count_query = text(f"""
-                SELECT COUNT(*) FROM {DB_TABLE} 
-                WHERE Timestamp >= :start_date AND Timestamp <= :end_date
-            """)
-            
-            params = {"start_date": DELETE_FROM_DATE, "end_date": DELETE_END_DATE}
+                SELECT COUNT_BIG(*) FROM {DB_TABLE} 
+                WHERE Timestamp BETWEEN :start_date AND :end_date
+            """).bindparams(*range_params)
             result = conn.execute(count_query, params).scalar()
 
-            if result == 0:
-                print(f"✅ No records found between {DELETE_FROM_DATE} and {DELETE_END_DATE}.")
-                return
-
-            print(f"⚠️  WARNING: You are about to DELETE {result} records.")
-            print(f"   📅 Range: {DELETE_FROM_DATE}  -->  {DELETE_END_DATE}")
-            confirm = input("Type 'DELETE' to confirm: ")
-
-            if confirm == "DELETE":
-                # 3. Perform Deletion
-                delete_query = text(f"""
-                    DELETE FROM {DB_TABLE} 
-                    WHERE Timestamp >= :start_date AND Timestamp <= :end_date
-                """)
-                conn.execute(delete_query, params)
-                conn.commit()
-                print(f"🗑️  Success: {result} records deleted.")
-            else:
-                print("❌ Operation cancelled.")
+        if result == 0:
+            print(f"✅ No records found between {DELETE_FROM_DATE} and {DELETE_END_DATE}.")
+            return
+
+        print(f"⚠️  WARNING: You are about to DELETE {result} records.")
+        print(f"   📅 Range: {DELETE_FROM_DATE}  -->  {DELETE_END_DATE}")
+        confirm = input("Type 'DELETE' to confirm: ")
+
+        if confirm == "DELETE":
+            # 3. Perform Deletion in batches, each committed on its own,
+            #    so the transaction log and lock footprint stay bounded
+            delete_query = text(f"""
+                SET NOCOUNT ON;
+                DELETE TOP ({DELETE_BATCH_SIZE}) FROM {DB_TABLE} 
+                WHERE Timestamp BETWEEN :start_date AND :end_date;
+                SELECT @@ROWCOUNT AS n;
+            """).bindparams(*range_params)
+            deleted = 0
+            while True:
+                with engine.begin() as conn:
+                    batch = conn.execute(delete_query, params).scalar()
+                deleted += batch
+                if batch < DELETE_BATCH_SIZE:
+                    break
+                print(f"   🗑️  {deleted} records deleted so far...", end='\r')
+            print(f"🗑️  Success: {deleted} records deleted.")
+        else:
+            print("❌ Operation cancelled.")
 
     except Exception as e:
         print(f"❌ Database Error: {e}")
@@ -1,12 +1,10 @@
-import random
-import pandas as pd
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, MetaData, Table
 from urllib.parse import quote_plus
 import io
 import base64
-import matplotlib.pyplot as plt
 import numpy as np
+from PIL import Image
 import calendar
 
 # --- CONFIGURATION ---
@@ -19,6 +17,12 @@ DB_TABLE = "ThermalReadings"
 # Year to generate data for
 YEAR = 2025
 
+# Rows bound per executemany call (one parameter array per chunk)
+INSERT_CHUNK_SIZE = 500
+
+# Vectorized random source for every mock value
+RNG = np.random.default_rng()
+
 # --- ASSET DEFINITIONS ---
 # Using the EXACT codes you provided
 ASSETS = [
@@ -29,89 +33,138 @@ ASSETS = [
 ]
 
 def get_db_engine():
+    """
+    Builds the SQL Server engine used for the bulk insert.
+    Inserts are plain executemany calls + pyodbc fast_executemany:
+    a multi-row VALUES statement would be capped by the 2100-parameter
+    limit and cannot be combined with fast_executemany.
+    """
     encoded_pass = quote_plus(DB_PASS)
     db_url = f"mssql+pyodbc://{DB_USER}:{encoded_pass}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
-    return create_engine(db_url, fast_executemany=True)
+    engine = create_engine(db_url, fast_executemany=True)
+
+    # Force pyodbc to bind the whole parameter array in one call instead of
+    # one sp_prepexec round-trip per row (the base64 images make rows wide).
+    checked = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def enable_fast_executemany(conn, cursor, statement, params, context, executemany):
+        if executemany:
+            cursor.fast_executemany = True
+            if not checked:
+                print(f"   ⚡ fast_executemany active: {cursor.fast_executemany}")
+                checked.append(True)
+
+    return engine
+
+# Inferno colormap as a (256, 3) uint8 table, built on first use so
+# matplotlib is only imported when an image is actually generated
+_INFERNO_LUT = None
+
+def get_inferno_lut():
+    global _INFERNO_LUT
+    if _INFERNO_LUT is None:
+        import matplotlib
+        _INFERNO_LUT = (matplotlib.colormaps['inferno'](np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+    return _INFERNO_LUT
+
+# The dummy images are display-only, so one noise field and one
+# output buffer are reused for every row
+_BASE_NOISE = RNG.random((10, 10))
+_BUF = io.BytesIO()
 
 def generate_dummy_image(temp_val):
     """Generates a tiny heat map image string."""
-    data = np.random.rand(10, 10) * temp_val 
-    buffer = io.BytesIO()
-    plt.imsave(buffer, data, cmap='inferno', format='jpeg')
-    buffer.seek(0)
-    return f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
-
-def calculate_temp(asset, date_obj):
-    """Calculates specific temperature based on the asset's assigned trend."""
-    day_of_year = date_obj.timetuple().tm_yday
+    data = _BASE_NOISE * temp_val 
+    lo, hi = data.min(), data.max()
+    idx = ((data - lo) * (255.0 / ((hi - lo) or 1.0))).astype(np.uint8)
+    _BUF.seek(0)
+    _BUF.truncate()
+    Image.fromarray(get_inferno_lut()[idx]).save(_BUF, 'JPEG', quality=70)
+    return f"data:image/jpeg;base64,{base64.b64encode(_BUF.getvalue()).decode('utf-8')}"
+
+# One pre-encoded image per asset; the picture only has to fill the column
+_IMG_CACHE = {}
+
+def get_asset_image(asset):
+    if asset['code'] not in _IMG_CACHE:
+        _IMG_CACHE[asset['code']] = generate_dummy_image(asset['base_temp'])
+    return _IMG_CACHE[asset['code']]
+
+def calculate_temps(timestamps):
+    """Calculates every asset's temperature for every timestamp in one pass, based on each asset's trend."""
+    months = np.array([t.month for t in timestamps])[:, None]
+    day_of_year = np.array([t.timetuple().tm_yday for t in timestamps])[:, None]
     season_factor = 1 + (0.15 * np.sin((day_of_year - 100) / 365 * 2 * np.pi))
-    
-    base = asset['base_temp']
-    trend = asset['trend']
-    noise = random.uniform(-1.0, 1.0)
 
-    final_temp = base
-    
-    if trend == 'stable':
-        final_temp = (base * season_factor) + noise
-        
-    elif trend == 'critical_spike':
-        # Spikes huge in July (Month 7)
-        if date_obj.month == 7:
-            final_temp = 75 + random.uniform(0, 5) # Trigger Critical (>70)
-        else:
-            final_temp = (base * season_factor) + noise
-
-    elif trend == 'steady_warming':
-        # Increases by ~2 degrees every month
-        increase = date_obj.month * 2.0 
-        final_temp = base + increase + noise
-
-    elif trend == 'steady_cooling':
-        # Decreases by ~2 degrees every month
-        decrease = date_obj.month * 2.5
-        final_temp = base - decrease + noise
-
-    return round(final_temp, 1)
-
-def generate_mock_weather(date_obj):
-    month = date_obj.month
-    if month in [12, 1, 2]: return round(random.uniform(10, 15), 1)
-    if month in [3, 4, 11]: return round(random.uniform(16, 22), 1)
-    if month in [5, 10]:    return round(random.uniform(23, 27), 1)
-    return round(random.uniform(28, 35), 1)
+    base = np.array([a['base_temp'] for a in ASSETS], dtype=float)
+    trend = np.array([a['trend'] for a in ASSETS])
+    shape = (len(timestamps), len(ASSETS))
+    noise = RNG.uniform(-1.0, 1.0, shape)
+
+    seasonal = (base * season_factor) + noise
+    # Spikes huge in July (Month 7) -> Trigger Critical (>70)
+    spike = np.where(months == 7, 75 + RNG.uniform(0, 5, shape), seasonal)
+    # Increases by ~2 degrees every month
+    warming = base + (months * 2.0) + noise
+    # Decreases by ~2 degrees every month
+    cooling = base - (months * 2.5) + noise
+
+    final_temp = np.select(
+        [trend == 'stable', trend == 'critical_spike', trend == 'steady_warming', trend == 'steady_cooling'],
+        [seasonal, spike, warming, cooling],
+        default=np.broadcast_to(base, shape)
+    )
+    return np.round(final_temp, 1)
+
+def generate_mock_weather(timestamps):
+    """Draws one outdoor temperature per (timestamp, asset) from the month's range."""
+    months = np.array([t.month for t in timestamps])
+    low = np.select([np.isin(months, [12, 1, 2]), np.isin(months, [3, 4, 11]), np.isin(months, [5, 10])], [10, 16, 23], 28)
+    high = np.select([np.isin(months, [12, 1, 2]), np.isin(months, [3, 4, 11]), np.isin(months, [5, 10])], [15, 22, 27], 35)
+    return np.round(RNG.uniform(low[:, None], high[:, None], (len(timestamps), len(ASSETS))), 1)
 
 def run_mock_generator():
     print(f"🚀 Generating MONTHLY Mock Data for {YEAR}...")
     
     engine = get_db_engine()
     rows = []
-    
-    # Loop through Months 1 to 12
-    for month in range(1, 13):
-        # Pick a random day in that month (e.g., between 10th and 20th to seem regular)
-        day = random.randint(10, 20) 
-        # Pick a random time (9 AM - 2 PM)
-        hour = random.randint(9, 14)
-        minute = random.randint(0, 59)
-        
-        # Create Timestamp object
-        timestamp = datetime(YEAR, month, day, hour, minute)
-        
+    n_months, n_assets = 12, len(ASSETS)
+
+    # Draw every random value up front in one call per quantity
+    # Pick a random day in each month (e.g., between 10th and 20th to seem regular)
+    days = RNG.integers(10, 21, n_months)
+    # Pick a random time (9 AM - 2 PM)
+    hours = RNG.integers(9, 15, n_months)
+    minutes = RNG.integers(0, 60, n_months)
+
+    # Create Timestamp objects for Months 1 to 12
+    timestamps = [
+        datetime(YEAR, month, int(day), int(hour), int(minute))
+        for month, day, hour, minute in zip(range(1, 13), days, hours, minutes)
+    ]
+
+    # All temperatures and weather for the year in one vectorized pass
+    center_temps = calculate_temps(timestamps)
+    weather_temps = generate_mock_weather(timestamps)
+    max_temps = center_temps + RNG.uniform(2, 5, (n_months, n_assets))
+    min_temps = center_temps - RNG.uniform(2, 5, (n_months, n_assets))
+    avg_temps = center_temps - RNG.uniform(0, 1, (n_months, n_assets))
+
+    for m, timestamp in enumerate(timestamps):
         # DB Timestamp (UTC: -2 hours from Mock Local Time)
         db_timestamp = timestamp - timedelta(hours=2)
-        ts_str = db_timestamp.strftime("%Y-%m-%d %H:%M:%S")
 
         print(f"   Processing Month: {timestamp.strftime('%B')}...", end='\r')
 
-        for asset in ASSETS:
-            center_temp = calculate_temp(asset, timestamp)
-            max_temp = center_temp + random.uniform(2, 5)
-            min_temp = center_temp - random.uniform(2, 5)
-            avg_temp = center_temp - random.uniform(0, 1)
+        for a, asset in enumerate(ASSETS):
+            center_temp = float(center_temps[m, a])
+            max_temp = float(max_temps[m, a])
+            min_temp = float(min_temps[m, a])
+            avg_temp = float(avg_temps[m, a])
             
             row = {
-                "Timestamp": ts_str,
+                "Timestamp": db_timestamp,
                 "Filename": f"MOCK_{asset['code']}_{timestamp.strftime('%Y%m%d')}.jpg",
                 "Camera_Serial": 999999,
                 "Asset_Name": asset['code'], 
@@ -122,16 +175,19 @@ def run_mock_generator():
                 "Delta_Temp_C": round(max_temp - min_temp, 1),
                 "Emissivity": 0.95,
                 "Distance": 2.0,
-                "weather_temp": generate_mock_weather(timestamp),
-                "Image_Base64": generate_dummy_image(center_temp) 
+                "weather_temp": float(weather_temps[m, a]),
+                "Image_Base64": get_asset_image(asset)
             }
             rows.append(row)
 
     print(f"\n📦 Inserting {len(rows)} rows into database...")
     
-    df = pd.DataFrame(rows)
     try:
-        df.to_sql(DB_TABLE, engine, if_exists='append', index=False)
+        # Reflect the existing table and hand the row dicts straight to executemany
+        table = Table(DB_TABLE, MetaData(), autoload_with=engine)
+        with engine.begin() as conn:
+            for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+                conn.execute(table.insert(), rows[i: i + INSERT_CHUNK_SIZE])
         print("✅ Success! Database populated with monthly data.")
     except Exception as e:
         print(f"❌ Error inserting data: {e}")
@@ -1,19 +1,25 @@
 ################################### AUTO THERMAL PIPELINE (SMART SVG EDITION) #################### 
 import os
+import sys
+import calendar
 import shutil
+import errno
+import itertools
 import json
 import subprocess
 import time
-import base64
-import io
 import re
 import flyr
 import pandas as pd
 import logging
 import threading
+import queue
 import atexit
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from logging.handlers import RotatingFileHandler
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.types import String, DateTime, Integer, Float, Text 
 from urllib.parse import quote_plus
 from watchdog.observers import Observer
@@ -23,9 +29,7 @@ from dotenv import load_dotenv
 # --- NEW IMPORTS FOR SVG GENERATION ---
 import matplotlib
 matplotlib.use('Agg') 
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
-import matplotlib.colors as colors
+import numpy as np
 
 # --- LOAD CONFIGURATION ---
 load_dotenv()
@@ -42,17 +46,28 @@ DB_PASS = os.getenv("DB_PASS")
 DB_TABLE = "ThermalReadings"
 
 TRIGGER_EVENT = threading.Event()
+LAST_EVENT_TIME = 0.0        # time.monotonic() of the latest watchdog event
+DEBOUNCE_SECONDS = 0.2       # run once the folder has been quiet this long
+
+# Decoder processes, started once under the __main__ guard (Windows spawns workers, so each start re-imports numpy/flyr)
+_POOL = None
+INLINE_MAX_FILES = 4         # smaller runs decode in-process: cheaper than a round-trip to the pool
 
 # --- LOGGING SETUP ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    datefmt='%d-%m-%Y %H:%M:%S',
-    handlers=[
-        RotatingFileHandler("history.log", maxBytes=5*1024*1024, backupCount=3, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+def setup_logging(to_file=True):
+    """Console + history.log in the main process; pool workers (re-imported on spawn) get the console only,
+    since a second open handle on history.log makes its rollover fail with PermissionError on Windows."""
+    handlers = [logging.StreamHandler()]
+    if to_file:
+        handlers.insert(0, RotatingFileHandler("history.log", maxBytes=5*1024*1024, backupCount=3, encoding='utf-8', delay=True))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%d-%m-%Y %H:%M:%S',
+                        handlers=handlers, force=True)   # force: replace handlers inherited on fork
+
+def start_pool():
+    """(Re)creates the decode pool; one with a dead worker is broken for good and gets replaced."""
+    global _POOL
+    if _POOL is not None: _POOL.shutdown(wait=False, cancel_futures=True)
+    _POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=setup_logging, initargs=(False,))
 
 # ==============================================================================
 # SECTION 1: HELPER FUNCTIONS
@@ -81,26 +96,193 @@ def init_db_engine():
     db_url = f"mssql+pyodbc://{DB_USER}:{encoded_pass}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
     return create_engine(db_url, fast_executemany=True)
 
+UPLOAD_COLS = ["Timestamp", "Filename", "Camera_Serial", "Asset_Name", 
+               "Max_Temp_C", "Min_Temp_C", "Center_Temp_C", "Avg_Temp_C", 
+               "Delta_Temp_C", "Emissivity", "Distance", "Image_Base64"]
+SQL_TYPES = {
+    "Timestamp": DateTime(),
+    "Filename": String(255),
+    "Camera_Serial": Integer(),
+    "Asset_Name": String(255),
+    "Max_Temp_C": Float(),
+    "Min_Temp_C": Float(),
+    "Center_Temp_C": Float(),
+    "Avg_Temp_C": Float(),
+    "Delta_Temp_C": Float(),
+    "Emissivity": Float(),
+    "Distance": Float(),
+    "Image_Base64": Text() 
+}
+
+# Server-side dedup: insert only if (asset, whole second, serial) is not stored yet -- same key as SIG_CACHE.
+# UPDLOCK/HOLDLOCK keeps two uploaders from both passing the check for the same reading.
+# Plain qmark SQL for the raw pyodbc cursor; parameter order is the one upload_params() builds.
+# {i} is the row's position in the batch, recorded in @ins when the row was actually inserted.
+INSERT_IF_NEW_SQL = (
+    f"IF NOT EXISTS (SELECT 1 FROM {DB_TABLE} WITH (UPDLOCK, HOLDLOCK) "
+    f"WHERE Asset_Name = ? AND Camera_Serial = ? AND Timestamp >= ? AND Timestamp < ?) "
+    f"BEGIN INSERT INTO {DB_TABLE} ({', '.join(UPLOAD_COLS)}) VALUES ({', '.join('?' * len(UPLOAD_COLS))}); "
+    "INSERT INTO @ins VALUES ({i}); END"
+)
+
+def insert_batch_sql(n):
+    """One round-trip for n guarded INSERTs; the single result set lists the positions that were new."""
+    # 16 parameters per row: BATCH_SIZE=50 stays far below SQL Server's 2100-parameter limit
+    return "\n".join(["SET NOCOUNT ON; DECLARE @ins TABLE (i int);"]
+                     + [INSERT_IF_NEW_SQL.format(i=i) for i in range(n)]
+                     + ["SELECT i FROM @ins;"])
+
+def upload_params(row):
+    """Row dict -> parameter tuple for INSERT_IF_NEW_SQL."""
+    ts = row["Timestamp"]
+    sig = ts.replace(microsecond=0)
+    return (row["Asset_Name"], row["Camera_Serial"], sig, sig + timedelta(seconds=1), 
+            ts, *(row[c] for c in UPLOAD_COLS[1:]))
+
+def ensure_table(engine):
+    """The guarded INSERT needs the table; create it empty with the proper types on a fresh DB."""
+    if not inspect(engine).has_table(DB_TABLE):
+        pd.DataFrame(columns=UPLOAD_COLS).to_sql(DB_TABLE, engine, index=False, dtype=SQL_TYPES)
+        logging.info(f"🆕 Created table {DB_TABLE}")
+
+SIG_INDEX = f"IX_{DB_TABLE}_Ts"
+
+def ensure_signature_index(engine):
+    """Narrow (Timestamp) INCLUDE (Asset_Name, Camera_Serial) index: the signature query and the
+    guarded INSERT then seek it instead of scanning rows dragging the large Image_Base64 pages."""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{SIG_INDEX}' AND object_id = OBJECT_ID('{DB_TABLE}')) "
+                f"CREATE NONCLUSTERED INDEX {SIG_INDEX} ON {DB_TABLE} (Timestamp) INCLUDE (Asset_Name, Camera_Serial)"
+            ))
+    except Exception as e:
+        # Without it each guarded batch scans the table under its range locks: still correct, but
+        # slower, and other writers to the table wait for the batch to commit
+        logging.warning(f"⚠️ Could not ensure index {SIG_INDEX}: {e}")
+
+_EXIF_FRACTION = re.compile(r"\.(\d{1,6})")
+
+def exif_datetime(raw_ts):
+    """EXIF 'YYYY:MM:DD HH:MM:SS[.fff][+HH:MM]' -> naive wall-clock datetime (offset dropped), or None."""
+    s = str(raw_ts)
+    try:
+        dt = datetime.strptime(s[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    frac = _EXIF_FRACTION.match(s, 19)
+    return dt.replace(microsecond=int(frac.group(1).ljust(6, "0"))) if frac else dt
+
+def signature_epoch(ts):
+    """Datetime -> whole seconds since epoch (wall clock, no tz), the timestamp part of a signature."""
+    return calendar.timegm(ts.timetuple()) if ts else None
+
 def get_existing_signatures(engine, start_date_str):
     try:
         query = f"SELECT Asset_Name, Timestamp, Camera_Serial FROM {DB_TABLE} WHERE Timestamp >= '{start_date_str}'"
         df = pd.read_sql(query, engine)
         if not df.empty:
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='mixed')
+            ts = pd.to_datetime(df['Timestamp'], format='mixed')
+            # Signature: (interned asset, epoch seconds, serial) -> compact, cheap to hash
+            epochs = ((ts - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).tolist()
             signatures = set(zip(
-                df['Asset_Name'], 
-                df['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S'),
-                df['Camera_Serial']
+                map(sys.intern, df['Asset_Name']), 
+                epochs,
+                df['Camera_Serial'].tolist()
             ))
             return signatures
         return set()
     except Exception as e:
+        # None, not set(): an outage must not look like "no readings stored"
         logging.warning(f"⚠️ DB Warning: {e}")
-        return set()
+        return None
+
+class ExifToolDaemon:
+    """One ExifTool kept alive with -stay_open, so Perl only starts once."""
+    READY = "{ready}"
+
+    def __init__(self, exiftool_path):
+        self.exiftool_path = exiftool_path
+        self.proc = None
+
+    def _start(self):
+        flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        self.proc = subprocess.Popen([self.exiftool_path, '-stay_open', 'True', '-@', '-', '-common_args', '-charset', 'filename=utf8'],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     text=True, encoding='utf-8', creationflags=flags)
+
+    def execute(self, args, timeout=15):
+        if self.proc is None or self.proc.poll() is not None: self._start()
+        self.proc.stdin.write("\n".join(args) + "\n-execute\n")
+        self.proc.stdin.flush()
+        watchdog = threading.Timer(timeout, self.proc.kill)
+        watchdog.start()
+        try:
+            lines = []
+            for line in self.proc.stdout:
+                if line.rstrip() == self.READY: return "".join(lines)
+                lines.append(line)
+        finally:
+            watchdog.cancel()
+        self.proc = None
+        raise RuntimeError("ExifTool exited before finishing the scan")
+
+    def close(self):
+        if self.proc is None: return
+        try:
+            if self.proc.poll() is None:
+                self.proc.stdin.write("-stay_open\nFalse\n")
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+        self.proc = None
+
+EXIFTOOL = ExifToolDaemon(EXIFTOOL_PATH)
+atexit.register(EXIFTOOL.close)
+
+# Only the dedup key fields: emissivity/distance come from flyr's own FFF parse in process_image
+METADATA_ARGS = ['-j', '-n', '-r', '-DateTimeOriginal', '-CameraSerialNumber', 
+                 '-ImageDescription', '-ext', 'jpg']
+
+# --- DUPLICATE SIGNATURE CACHE (loaded once, kept in sync with our own uploads) ---
+SIG_CACHE = set()
+SIG_CACHE_FROM = None        # oldest 'YYYY-MM-DD 00:00:00' the cache covers
+SIG_LOCK = threading.Lock()
+SIG_STARTUP_DAYS = 7
+SIG_REFRESH_SECONDS = 600    # re-read the DB to pick up out-of-band inserts/deletes
+
+def load_signature_cache(engine, start_date_str):
+    """Builds the new set off-lock, then swaps it in; on a failed query the old cache stays."""
+    global SIG_CACHE, SIG_CACHE_FROM
+    fresh = get_existing_signatures(engine, start_date_str)
+    if fresh is None:
+        logging.warning("   ⚠️ Signature cache refresh failed, keeping the previous one.")
+        return
+    with SIG_LOCK:
+        SIG_CACHE = fresh
+        SIG_CACHE_FROM = start_date_str
+    logging.info(f"   🗂️ Signature cache: {len(fresh)} records since {start_date_str[:10]}")
+
+def ensure_signature_window(engine, start_date_str):
+    """Only hits the DB when images older than the cached window show up."""
+    if SIG_CACHE_FROM is None or start_date_str < SIG_CACHE_FROM:
+        load_signature_cache(engine, start_date_str)
+
+def signature_refresher(engine):
+    while True:
+        time.sleep(SIG_REFRESH_SECONDS)
+        if SIG_CACHE_FROM is not None:
+            load_signature_cache(engine, SIG_CACHE_FROM)
 
 def get_metadata(folder):
-    cmd = [EXIFTOOL_PATH, '-j', '-n', '-r', '-DateTimeOriginal', '-CameraSerialNumber', 
-           '-ImageDescription', '-Emissivity', '-ObjectDistance', '-ext', 'jpg', folder]
+    try:
+        output = EXIFTOOL.execute(METADATA_ARGS + [folder])
+        return json.loads(output) if output.strip() else []
+    except Exception as e:
+        logging.warning(f"⚠️ ExifTool daemon failed ({e}). Falling back to a one-shot scan.")
+    # Fallback: the original one process per scan
+    cmd = [EXIFTOOL_PATH] + METADATA_ARGS + [folder]
     try:
         flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
         result = subprocess.run(cmd, capture_output=True, text=True, creationflags=flags, timeout=15, stdin=subprocess.DEVNULL)
@@ -115,39 +297,34 @@ def clean_asset_code(raw_input):
     return clean if clean else None
 
 # --- NEW FUNCTION: GENERATE SMART SVG ---
-# --- NEW FUNCTION: GENERATE SMART SVG (FIXED) ---
-def generate_interactive_svg(celsius_matrix):
+# Inferno colormap as a (256, 3) uint8 table, sampled once
+_LUT_RGB = np.round(matplotlib.colormaps['inferno'](np.arange(256))[:, :3] * 255).astype(np.uint8)
+# ... and pre-packed as 0xRRGGBB, so a cell's fill is a single gather
+_LUT_RGB_U32 = (_LUT_RGB[:, 0].astype(np.uint32) << 16) | (_LUT_RGB[:, 1].astype(np.uint32) << 8) | _LUT_RGB[:, 2]
+
+def generate_interactive_svg(celsius_matrix, step=8):
     """
     Converts the 2D temperature matrix into an SVG string with tooltips.
     """
     height, width = celsius_matrix.shape
     
-    # 1. Setup Colors (Inferno is great for thermal)
-    norm = colors.Normalize(vmin=celsius_matrix.min(), vmax=celsius_matrix.max())
+    # 1. Sample one temperature per step x step cell
+    sub = celsius_matrix[::step, ::step]
+    ys, xs = np.mgrid[0:height:step, 0:width:step]
     
-    # --- FIX: Use new Matplotlib syntax ---
-    # Old way: cmap = cm.get_cmap('inferno')
-    cmap = matplotlib.colormaps['inferno'] 
+    # 2. Colors: scale into the LUT's 256 bins (same as Normalize + cmap)
+    mn, mx = celsius_matrix.min(), celsius_matrix.max()
+    idx = np.clip((sub - mn) * (256.0 / ((mx - mn) or 1.0)), 0, 255).astype(np.uint8)
+    hex_colors = _LUT_RGB_U32[idx]
     
-    # 2. Start SVG String
+    # 3. Build the Grid (all numbers already computed, Python only formats)
     svg_parts = [f'<svg viewBox="0 0 {width} {height}" preserveAspectRatio="none" shape-rendering="crispEdges" style="width:100%; height:100%;">']
-    
-    # 3. Build the Grid
-    step = 8 
-    
-    for y in range(0, height, step):
-        for x in range(0, width, step):
-            temp = celsius_matrix[y, x]
-            
-            # Get Color
-            rgba = cmap(norm(temp))
-            hex_color = colors.to_hex(rgba)
-            
-            rect = f'<rect x="{x}" y="{y}" width="{step}" height="{step}" fill="{hex_color}"><title>{temp:.1f}°C</title></rect>'
-            svg_parts.append(rect)
-            
+    # step is fixed per call, so bake it in once and %-format each (x, y, color, temp) tuple at C speed
+    rect = ('<rect x="%%d" y="%%d" width="%d" height="%d" fill="#%%06x"><title>%%.1f°C</title></rect>' % (step, step)).__mod__
+    svg_parts.extend(map(rect, zip(xs.ravel().tolist(), ys.ravel().tolist(), hex_colors.ravel().tolist(), sub.ravel().tolist())))
     svg_parts.append('</svg>')
     return "".join(svg_parts)
+
 def process_image(filepath, metadata_entry):
     filename = os.path.basename(filepath)
     
@@ -159,30 +336,36 @@ def process_image(filepath, metadata_entry):
 
     try:
         serial_int = int(metadata_entry.get("CameraSerialNumber", 0))
-        ts_str = str(metadata_entry["DateTimeOriginal"]).replace(":", "-", 2)
+        ts = metadata_entry.get("Timestamp")   # parsed once in run_pipeline
+        if ts is None: raise ValueError("missing/invalid DateTimeOriginal")
         thermogram = flyr.unpack(filepath)
         celsius = thermogram.celsius
+        params = thermogram.metadata or {}
         
         # --- GENERATE SMART SVG ---
         smart_svg_string = generate_interactive_svg(celsius)
         # --------------------------
 
-        # Calculate Stats
+        # Calculate Stats (one reduction each; delta reuses min/max)
         h, w = celsius.shape
         cy, cx = h // 2, w // 2
+        t_max, t_min, t_avg = celsius.max(), celsius.min(), celsius.mean()
+        t_center = celsius[cy-1:cy+2, cx-1:cx+2].mean()
+        # Round all five in one call; tolist() hands back plain Python floats for the DB driver
+        max_c, min_c, avg_c, center_c, delta_c = np.round([t_max, t_min, t_avg, t_center, t_max - t_min], 1).tolist()
         
         row = {
-            "Timestamp": ts_str, 
+            "Timestamp": ts, 
             "Filename": filename,
             "Camera_Serial": serial_int,
             "Asset_Name": asset_str,
-            "Max_Temp_C": round(celsius.max(), 1),
-            "Min_Temp_C": round(celsius.min(), 1),
-            "Avg_Temp_C": round(celsius.mean(), 1),
-            "Center_Temp_C": round(celsius[cy-1:cy+2, cx-1:cx+2].mean(), 1),
-            "Delta_Temp_C": round(celsius.max() - celsius.min(), 1),
-            "Emissivity": float(metadata_entry.get("Emissivity", 0.95)),
-            "Distance": round(float(metadata_entry.get("ObjectDistance", 1.0)), 1),
+            "Max_Temp_C": max_c,
+            "Min_Temp_C": min_c,
+            "Avg_Temp_C": avg_c,
+            "Center_Temp_C": center_c,
+            "Delta_Temp_C": delta_c,
+            "Emissivity": round(float(params.get("emissivity", 0.95)), 2),   # stored as float32 in the FFF block
+            "Distance": round(float(params.get("object_distance", 1.0)), 1),
             
             # WE SAVE THE SVG INTO THE 'Image_Base64' COLUMN
             # This avoids adding new columns. It just works.
@@ -191,57 +374,98 @@ def process_image(filepath, metadata_entry):
         
         return row
     except Exception as e:
-        logging.error(f"Error processing {filename}: {e}")
+        logging.error("Error processing %s: %s", filename, e)
         return None 
 
 # ==============================================================================
 # SECTION 2 & 3 & 4 (REMAIN UNCHANGED)
 # ==============================================================================
-# (Copy the rest of your previous script here: is_file_locked, run_pipeline, main loop, etc.)
+# (Copy the rest of your previous script here: wait_for_folder_stability, run_pipeline, main loop, etc.)
 # I will strictly omit them to save space, as they are identical to the 'Final Master' script provided earlier.
 # Just make sure to include the helper functions and the __main__ block at the bottom.
 
-def is_file_locked(filepath):
-    if not os.path.exists(filepath): return False
-    try:
-        with open(filepath, 'ab'): pass
-        return False
-    except IOError: return True
+def scan_jpgs(folder):
+    """{name: (size, mtime)} for every JPG, taken from a single directory read."""
+    snapshot = {}
+    with os.scandir(folder) as it:
+        for e in it:
+            if not (e.is_file(follow_symlinks=False) and e.name.lower().endswith(".jpg")): continue
+            try: st = e.stat()
+            except OSError: continue
+            snapshot[e.name] = (st.st_size, st.st_mtime)
+    return snapshot
 
-def wait_for_folder_stability(folder, timeout=15):
+def wait_for_folder_stability(folder, timeout=15, settle=2.0):
+    """A file is stable once its size and mtime stop changing and it is 'settle' seconds old."""
     start_time = time.time()
+    try: previous = scan_jpgs(folder)
+    except OSError: return False
     while (time.time() - start_time) < timeout:
-        locked_files = []
-        try:
-            files = [f for f in os.listdir(folder) if f.lower().endswith(".jpg")]
-        except: return False 
-        if not files: return True
-        for f in files:
-            full_path = os.path.join(folder, f)
-            try:
-                if time.time() - os.path.getmtime(full_path) > 60: continue 
-            except OSError: continue 
-            if is_file_locked(full_path): locked_files.append(f)
-        if not locked_files: return True 
-        logging.info(f"⏳ Waiting for locks: {locked_files[:3]}...")
-        time.sleep(1)
+        time.sleep(0.5)
+        try: current = scan_jpgs(folder)
+        except OSError: return False
+        now = time.time()
+        busy = [n for n, (size, mtime) in current.items() if previous.get(n) != (size, mtime) or now - mtime < settle]
+        if not busy: return True 
+        logging.info("⏳ Waiting for writes: %s...", busy[:3])
+        previous = current
     return False
 
+ARCHIVED_NAMES = None    # lower-cased names in ARCHIVE_FOLDER, listed once per run instead of exists() per move
+_COLLISION_IDS = itertools.count(int(time.time()))
+
 def move_to_archive(filename):
+    global ARCHIVED_NAMES
     src = os.path.join(INPUT_FOLDER, filename)
-    dst = os.path.join(ARCHIVE_FOLDER, filename)
     try:
-        if os.path.exists(dst):
+        if ARCHIVED_NAMES is None:
+            with os.scandir(ARCHIVE_FOLDER) as it:
+                ARCHIVED_NAMES = {e.name.lower() for e in it}
+        name = filename
+        # os.replace overwrites silently: keep suffixing until the name is free
+        while name.lower() in ARCHIVED_NAMES:
             base, ext = os.path.splitext(filename)
-            dst = os.path.join(ARCHIVE_FOLDER, f"{base}_{int(time.time())}{ext}")
-        shutil.move(src, dst)
+            name = f"{base}_{next(_COLLISION_IDS)}{ext}"
+        dst = os.path.join(ARCHIVE_FOLDER, name)
+        try:
+            os.replace(src, dst)    # same volume: one atomic rename, no copy
+        except OSError as e:
+            if e.errno != errno.EXDEV: raise
+            shutil.move(src, dst)
+        ARCHIVED_NAMES.add(name.lower())
         return True
     except Exception as e:
-        logging.error(f"❌ Archive Error: {e}")
+        logging.error("❌ Archive Error: %s", e)
         return False
 
+def upload_writer(raw_conn, rows_q, state):
+    """Drains (filename, params) from rows_q into guarded-insert batches, one commit each, until the None sentinel."""
+    cursor = raw_conn.cursor()
+    batch, done = [], False
+    while not done:
+        try: item = rows_q.get(timeout=0.2)
+        except queue.Empty: item = False       # decoder is slow: flush what we have
+        if item is None: done = True
+        elif item: batch.append(item)
+        if batch and (done or item is False or len(batch) >= BATCH_SIZE):
+            if state["error"] is None:         # after a failure keep draining so the producer never blocks
+                try:
+                    # One round-trip per batch; the DB skips anything already stored and says which rows were new
+                    cursor.execute(insert_batch_sql(len(batch)), [v for _, p in batch for v in p])
+                    inserted = {i for (i,) in cursor.fetchall()}
+                    # Commit now: UPDLOCK/HOLDLOCK range locks are released per batch, not held across the run
+                    raw_conn.commit()
+                    for i, (f, _) in enumerate(batch):
+                        state["uploaded" if i in inserted else "duplicates"].append(f)
+                except Exception as e:
+                    raw_conn.rollback()
+                    state["error"] = e
+            batch = []
+
 def run_pipeline(db_engine):
+    global ARCHIVED_NAMES
     logging.info("🔄 Starting Pipeline Run...")
+    ARCHIVED_NAMES = None   # re-list the archive lazily, in case it was cleaned up between runs
     meta_list = get_metadata(INPUT_FOLDER)
     if not meta_list:
         logging.info("   ℹ️ No readable images found.")
@@ -252,82 +476,100 @@ def run_pipeline(db_engine):
         if 'SourceFile' in m:
             fname = os.path.basename(m['SourceFile'])
             meta_dict[fname] = m
-            if 'DateTimeOriginal' in m:
-                timestamps.append(str(m['DateTimeOriginal']).replace(":", "-", 2))
+            # Parse DateTimeOriginal once; dedup and process_image both reuse this datetime
+            m['Timestamp'] = exif_datetime(m.get('DateTimeOriginal', ''))
+            if m['Timestamp'] is not None:
+                timestamps.append(m['Timestamp'])
     if not timestamps: return 
-    oldest = min(timestamps)
-    query_start = oldest[:10] + " 00:00:00"
+    query_start = min(timestamps).strftime("%Y-%m-%d 00:00:00")
     try:
-        existing = get_existing_signatures(db_engine, query_start)
+        ensure_signature_window(db_engine, query_start)
     except Exception as e:
         logging.error(f"❌ DB Query Failed: {e}")
         return
-    files = [f for f in os.listdir(INPUT_FOLDER) if f.lower().endswith(".jpg")]
+    with SIG_LOCK:
+        existing = SIG_CACHE   # the refresher swaps in a new set instead of clearing this one
+    signatures = {}
+    with os.scandir(INPUT_FOLDER) as it:
+        files = [e.name for e in it if e.is_file(follow_symlinks=False) and e.name.lower().endswith(".jpg")]
     files_to_process = []
     for f in files:
         m_data = meta_dict.get(f, {})
         raw_asset = m_data.get("ImageDescription", "")
         asset = clean_asset_code(raw_asset)
-        ts = str(m_data.get("DateTimeOriginal", "")).replace(":", "-", 2)[:19]
+        ts = signature_epoch(m_data.get("Timestamp"))
         try: serial = int(m_data.get("CameraSerialNumber", 0))
         except: serial = 0
-        if asset and ts and (asset, ts, serial) in existing:
-            logging.info(f"   ⚠️ Duplicate: {f} -> Archiving...")
+        if asset and ts is not None and (asset, ts, serial) in existing:
+            logging.info("   ⚠️ Duplicate: %s -> Archiving...", f)
             move_to_archive(f)
         else:
             files_to_process.append(f)
+            if asset and ts is not None: signatures[f] = (asset, ts, serial)
     if not files_to_process:
         logging.info("✅ No new data to upload.")
         return
     logging.info(f"🚀 Processing {len(files_to_process)} NEW images...")
-    total_uploaded = 0
-    sql_types = {
-        "Timestamp": DateTime(),
-        "Filename": String(255),
-        "Camera_Serial": Integer(),
-        "Asset_Name": String(255),
-        "Max_Temp_C": Float(),
-        "Min_Temp_C": Float(),
-        "Center_Temp_C": Float(),
-        "Avg_Temp_C": Float(),
-        "Delta_Temp_C": Float(),
-        "Emissivity": Float(),
-        "Distance": Float(),
-        "Image_Base64": Text() 
-    }
-    for i in range(0, len(files_to_process), BATCH_SIZE):
-        chunk = files_to_process[i : i + BATCH_SIZE]
-        new_rows = []
-        uploaded_filenames = []
-        for f in chunk:
-            row = process_image(os.path.join(INPUT_FOLDER, f), meta_dict.get(f, {}))
-            if row: 
-                new_rows.append(row)
-                uploaded_filenames.append(f)
-        if new_rows:
-            df = pd.DataFrame(new_rows)
-            cols = ["Timestamp", "Filename", "Camera_Serial", "Asset_Name", 
-                    "Max_Temp_C", "Min_Temp_C", "Center_Temp_C", "Avg_Temp_C", 
-                    "Delta_Temp_C", "Emissivity", "Distance", "Image_Base64"]
-            df = df[cols]
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='mixed').dt.tz_localize(None)
-            try:
-                df.to_sql(DB_TABLE, db_engine, if_exists='append', index=False, dtype=sql_types)
-                total_uploaded += len(df)
-                for f in uploaded_filenames: move_to_archive(f)
-            except Exception as e:
-                logging.error(f"❌ Chunk Upload Failed: {e}")
+    # One raw pyodbc connection for the run, one transaction per writer batch; only committed files are archived.
+    # Decoding (process pool) and uploading (writer thread) overlap through a bounded queue.
+    state = {"uploaded": [], "duplicates": [], "error": None}
+    rows_q = queue.Queue(maxsize=2 * BATCH_SIZE)
+    raw_conn = db_engine.raw_connection()
+    try:
+        writer = threading.Thread(target=upload_writer, args=(raw_conn, rows_q, state), daemon=True)
+        writer.start()
+        try:
+            # flyr decode + SVG build are CPU-bound and independent per file: fan them out
+            decode = map if _POOL is None or len(files_to_process) <= INLINE_MAX_FILES else _POOL.map
+            for i in range(0, len(files_to_process), BATCH_SIZE):
+                if state["error"] is not None: break
+                chunk = files_to_process[i : i + BATCH_SIZE]
+                paths = [os.path.join(INPUT_FOLDER, f) for f in chunk]
+                metas = [meta_dict.get(f, {}) for f in chunk]
+                try:
+                    for f, row in zip(chunk, decode(process_image, paths, metas)):
+                        if row: rows_q.put((f, upload_params(row)))
+                except BrokenProcessPool as e:
+                    # A worker was killed (native crash, OOM): upload what we have, the rest waits for the next run
+                    logging.error("❌ Decode worker died (%s). Restarting the pool.", e)
+                    start_pool()
+                    break
+        finally:
+            rows_q.put(None)
+            writer.join()
+    except Exception as e:
+        if state["error"] is None: state["error"] = e
+    finally:
+        raw_conn.close()
+    if state["error"] is not None:
+        # Earlier batches are committed and archived below; the rest stays in the folder for the next run
+        logging.error(f"❌ Upload Failed (batch rolled back): {state['error']}")
+    uploaded_filenames = state["uploaded"]
+    duplicate_filenames = state["duplicates"]   # already in the DB (e.g. another uploader got there first)
+    total_uploaded = len(uploaded_filenames)
+    stored = uploaded_filenames + duplicate_filenames
+    with SIG_LOCK:
+        SIG_CACHE.update(signatures[f] for f in stored if f in signatures)
+    for f in stored: move_to_archive(f)
+    if duplicate_filenames:
+        logging.info(f"   ⚠️ {len(duplicate_filenames)} duplicates skipped by the DB -> Archived.")
     if total_uploaded > 0:
         logging.info(f"🎉 SUCCESS: Uploaded {total_uploaded} records & Archived.")
 
 class FileTrigger(FileSystemEventHandler):
-    def _trigger(self, path):
+    def _trigger(self, path, announce=True):
+        global LAST_EVENT_TIME
         if path.lower().endswith(".jpg"):
-            print("-------------------------------------------------------")
-            logging.info("⏳ New file detected.")
+            LAST_EVENT_TIME = time.monotonic()
+            if announce:
+                print("-------------------------------------------------------")
+                logging.info("⏳ New file detected.")
             TRIGGER_EVENT.set() 
     def on_created(self, event):
         if not event.is_directory: self._trigger(event.src_path)
+    def on_closed(self, event):
+        # Writer released the file (inotify only): re-arm the run without a second banner
+        if not event.is_directory: self._trigger(event.src_path, announce=False)
     def on_moved(self, event):
         if not event.is_directory: self._trigger(event.dest_path)
 
@@ -344,9 +586,12 @@ def shutdown_handler(db_engine):
     logging.info("🛑 Shutting down gracefully...")
     try: db_engine.dispose()
     except: pass
+    if _POOL is not None:
+        _POOL.shutdown(cancel_futures=True)
     logging.info("👋 Goodbye.")
 
 if __name__ == "__main__":
+    setup_logging()
     print("-------------------------------------------------------")
     logging.info("🛠️  Performing Startup Health Check...")
     if not validate_environment():
@@ -360,9 +605,14 @@ if __name__ == "__main__":
         atexit.register(shutdown_handler, db_engine)
         with db_engine.connect() as conn:
             logging.info(f"✅ Database Connected to Table: {DB_NAME}.{DB_TABLE}")
+        ensure_table(db_engine)
+        ensure_signature_index(db_engine)
     except Exception as e:
         logging.error(f"❌ CRITICAL DB ERROR: {e}")
         exit()
+    start_pool()
+    load_signature_cache(db_engine, (datetime.now() - timedelta(days=SIG_STARTUP_DAYS)).strftime("%Y-%m-%d 00:00:00"))
+    threading.Thread(target=signature_refresher, args=(db_engine,), daemon=True).start()
     run_pipeline(db_engine)
     observer = Observer()
     observer.schedule(FileTrigger(), INPUT_FOLDER, recursive=False)
@@ -372,8 +622,11 @@ if __name__ == "__main__":
     try:
         while True:
             if TRIGGER_EVENT.wait(timeout=1): 
-                time.sleep(1) 
+                # Clear first so an event landing mid-run re-arms the next one
                 TRIGGER_EVENT.clear()
+                # Quiescence debounce: a burst of copies coalesces into a single run
+                while time.monotonic() - LAST_EVENT_TIME < DEBOUNCE_SECONDS:
+                    time.sleep(0.05)
                 if wait_for_folder_stability(INPUT_FOLDER):
                     run_pipeline(db_engine)
                 else:
@@ -1,6 +1,8 @@
 ################################### AUTO THERMAL PIPELINE (FINAL MASTER - DUPLICATE PROOF) ####################
 import os
 import shutil
+import errno
+import itertools
 import json
 import subprocess
 import time
@@ -8,24 +10,35 @@ import base64
 import io
 import re
 import flyr
-import pandas as pd
 import logging
+import tempfile
 import threading
+import queue
 import atexit
 import requests
+from collections import defaultdict
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from logging.handlers import RotatingFileHandler
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, bindparam, inspect, MetaData, Table, Column
 from sqlalchemy.types import String, DateTime, Integer, Float, Text
 from urllib.parse import quote_plus
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from dotenv import load_dotenv
 
-# --- HEADLESS MODE (Prevents crashes on servers) ---
+# --- COLORMAP SOURCE (only the LUT is used, no pyplot figures) ---
 import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
+
+# --- OPTIONAL: libjpeg-turbo encoder (falls back to Pillow when missing) ---
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+    _TURBO = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _TURBO = None
 
 # --- LOAD CONFIGURATION ---
 load_dotenv()
@@ -47,16 +60,34 @@ ALEX_LON = 29.9187
 
 TRIGGER_EVENT = threading.Event()
 
+# Worker processes for process_image; created under the __main__ guard (Windows spawns workers)
+_POOL = None
+
 # --- LOGGING SETUP ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    datefmt='%d-%m-%Y %H:%M:%S',
-    handlers=[
-        RotatingFileHandler("history.log", maxBytes=5*1024*1024, backupCount=3, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+def setup_logging(to_file=True):
+    """
+    Console + history.log for the main process. Pool workers re-import
+    this module (spawn on Windows) and get the console only: a second
+    open handle on history.log makes its rollover fail in every process.
+    """
+    handlers = [logging.StreamHandler()]
+    if to_file:
+        handlers.insert(0, RotatingFileHandler("history.log", maxBytes=5*1024*1024, backupCount=3, encoding='utf-8', delay=True))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(message)s',
+        datefmt='%d-%m-%Y %H:%M:%S',
+        handlers=handlers,
+        force=True   # replaces anything inherited (fork) or set up implicitly by an early log call
+    )
+
+
+def start_pool():
+    """(Re)creates the decode pool; a pool with a dead worker is unusable and gets replaced."""
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+    _POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=setup_logging, initargs=(False,))
 
 # ==============================================================================
 # SECTION 1: HELPER FUNCTIONS & DB SETUP
@@ -89,41 +120,231 @@ def validate_environment():
 def init_db_engine():
     encoded_pass = quote_plus(DB_PASS)
     db_url = f"mssql+pyodbc://{DB_USER}:{encoded_pass}@{DB_SERVER}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
-    return create_engine(db_url, fast_executemany=True)
+    # Warm pool: pre_ping replaces connections the server dropped while idle,
+    # recycle retires them before the network gear does
+    return create_engine(
+        db_url,
+        fast_executemany=True,
+        pool_size=4,
+        max_overflow=4,
+        pool_pre_ping=True,
+        pool_recycle=1800
+    )
+
+
+KEEPALIVE_SECONDS = 600
+
+
+def db_keepalive(engine):
+    """Touches the pool every few minutes so the first batch after a quiet spell isn't a cold connect."""
+    while True:
+        time.sleep(KEEPALIVE_SECONDS)
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception:
+            pass
+
+
+# Column types used only when the table has to be created on a fresh DB
+SQL_TYPES = {
+    "Timestamp": DateTime(),
+    "Filename": String(255),
+    "Camera_Serial": Integer(),
+    "Asset_Name": String(255),
+    "Max_Temp_C": Float(),
+    "Min_Temp_C": Float(),
+    "Center_Temp_C": Float(),
+    "Avg_Temp_C": Float(),
+    "Delta_Temp_C": Float(),
+    "Emissivity": Float(),
+    "Distance": Float(),
+    "weather_temp": Float(),
+    "Image_Base64": Text()
+}
+
+# --- OPTIONAL: BCP BULK COPY (falls back to executemany when missing) ---
+# Opt-in only: bcp runs with Windows auth (-T), since -P would show DB_PASS in the process list
+BCP_TRUSTED = os.getenv("BCP_TRUSTED", "").strip().lower() in ("1", "true", "yes")
+BCP_PATH = shutil.which("bcp") if BCP_TRUSTED else None
+
+
+def init_upload_table(engine):
+    """
+    Reflects the target table (creating it on a fresh DB). Its column
+    order is the field order bcp expects in the data file.
+    """
+    if not inspect(engine).has_table(DB_TABLE):
+        meta = MetaData()
+        Table(DB_TABLE, meta, *[Column(name, col_type) for name, col_type in SQL_TYPES.items()])
+        meta.create_all(engine)
+        logging.info(f"🆕 Created table {DB_TABLE}")
+    if not BCP_PATH:
+        logging.info("ℹ️ bcp not enabled (BCP_TRUSTED) or not installed, uploading with executemany.")
+    return Table(DB_TABLE, MetaData(), autoload_with=engine)
+
+
+def _bcp_field(value):
+    """One field of bcp character format: empty -> NULL, datetimes as ODBC canonical text."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+def bcp_upload(rows, columns):
+    """
+    Streams the rows through the bcp bulk-copy utility. Rows are written
+    straight from the dicts to a tab-separated temp file, one field per
+    table column (identity values are ignored by bcp without -E).
+    Connects with the Windows account (-T), so no password is on the command line.
+    """
+    fd, data_path = tempfile.mkstemp(suffix=".tsv")
+    try:
+        # bcp -c reads '\n' as CRLF; -C 65001 = UTF-8 file
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fh:
+            for row in rows:
+                fh.write("\t".join(_bcp_field(row.get(c)) for c in columns))
+                fh.write("\r\n")
+
+        flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        result = subprocess.run(
+            [
+                BCP_PATH, f"{DB_NAME}.dbo.{DB_TABLE}", "in", data_path,
+                "-S", DB_SERVER, "-T",
+                "-c", "-C", "65001", "-t", "\\t", "-r", "\\n", "-b", "10000"
+            ],
+            capture_output=True,
+            text=True,
+            creationflags=flags,
+            timeout=120,
+            stdin=subprocess.DEVNULL
+        )
+        if result.returncode != 0 or "Error = [" in result.stdout:
+            raise RuntimeError(f"bcp failed: {(result.stdout + result.stderr).strip()[-500:]}")
+    finally:
+        os.remove(data_path)
+
+
+def upload_rows(db_engine, table, rows):
+    """Bulk copy when bcp is enabled and installed, otherwise one fast_executemany INSERT."""
+    if BCP_PATH:
+        bcp_upload(rows, [c.name for c in table.columns])
+    else:
+        with db_engine.begin() as conn:
+            conn.execute(table.insert(), rows)
 
 
 def get_existing_signatures(engine, start_date_str):
     """
     Checks DB for existing records to prevent duplicates.
-    Signature: (Asset Name, Timestamp, Camera Serial)
+    Signature: (Asset Name, Timestamp, Camera Serial), indexed as
+    {(asset, 'YYYY-MM-DD'): {('HH:MM:SS', serial), ...}} so a lookup
+    only touches that asset's readings for that day.
     """
+    signatures = defaultdict(set)
     try:
-        query = f"SELECT Asset_Name, Timestamp, Camera_Serial FROM {DB_TABLE} WHERE Timestamp >= '{start_date_str}'"
-        df = pd.read_sql(query, engine)
-
-        if not df.empty:
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='mixed')
-
-            # Create a set of tuples: (Asset, Timestamp_String, Serial)
-            signatures = set(zip(
-                df['Asset_Name'],
-                df['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S'),
-                df['Camera_Serial']
-            ))
-            return signatures
-        return set()
+        # Server formats the timestamp (style 120 = 'YYYY-MM-DD HH:MM:SS'); rows are read off
+        # pyodbc's forward-only cursor straight into the set: no DataFrame, no per-row strftime
+        query = text(f"""
+            SELECT Asset_Name, CONVERT(varchar(19), Timestamp, 120) AS ts, Camera_Serial
+            FROM {DB_TABLE} WHERE Timestamp >= :start_date
+        """).bindparams(bindparam("start_date", type_=DateTime))
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d %H:%M:%S")
+
+        with engine.connect() as conn:
+            rows = conn.execute(query, {"start_date": start_date})
+            for asset, ts, serial in rows:
+                signatures[(asset, ts[:10])].add((ts[11:19], serial))
+        return signatures
     except Exception as e:
         logging.warning(f"⚠️ DB Warning: {e}")
-        return set()
+        return defaultdict(set)
+
+
+class ExifToolDaemon:
+    """
+    Keeps one ExifTool process alive in -stay_open mode so each scan
+    only pays for the read, not for starting Perl and loading ExifTool.
+    Calls are serialized: the pipe carries one command at a time.
+    """
+    READY = "{ready}"
+
+    def __init__(self, exiftool_path):
+        self.exiftool_path = exiftool_path
+        self.proc = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        self.proc = subprocess.Popen(
+            [
+                self.exiftool_path,
+                '-stay_open', 'True',
+                '-@', '-',
+                '-common_args', '-charset', 'filename=utf8'
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            creationflags=flags
+        )
+
+    def execute(self, args, timeout=15):
+        """Runs one command and returns everything printed before {ready}."""
+        with self.lock:
+            if self.proc is None or self.proc.poll() is not None:
+                self._start()
+
+            try:
+                self.proc.stdin.write("\n".join(args) + "\n-execute\n")
+                self.proc.stdin.flush()
+            except OSError:
+                self.proc.kill()
+                self.proc = None
+                raise
+
+            # A hung scan kills the process, which ends the read loop below
+            watchdog = threading.Timer(timeout, self.proc.kill)
+            watchdog.start()
+            try:
+                lines = []
+                for line in self.proc.stdout:
+                    if line.rstrip() == self.READY:
+                        return "".join(lines)
+                    lines.append(line)
+            finally:
+                watchdog.cancel()
+
+            self.proc = None
+            raise RuntimeError("ExifTool exited before finishing the scan")
+
+    def close(self):
+        with self.lock:
+            if self.proc is None:
+                return
+            try:
+                if self.proc.poll() is None:
+                    self.proc.stdin.write("-stay_open\nFalse\n")
+                    self.proc.stdin.flush()
+                    self.proc.wait(timeout=5)
+            except Exception:
+                self.proc.kill()
+            self.proc = None
+
+
+EXIFTOOL = ExifToolDaemon(EXIFTOOL_PATH)
 
 
-def get_metadata(folder):
+def get_metadata(targets):
     """
-    Run exiftool recursively on the root folder and
-    filter out anything inside ARCHIVE_FOLDER.
+    Run exiftool on the given files/folders (recursively), never
+    descending into ARCHIVE_FOLDER.
     """
-    cmd = [
-        EXIFTOOL_PATH,
+    args = [
         '-j', '-n', '-r',
         '-DateTimeOriginal',
         '-CameraSerialNumber',
@@ -131,40 +352,126 @@ def get_metadata(folder):
         '-Emissivity',
         '-ObjectDistance',
         '-ext', 'jpg',
-        folder
+        '-i', os.path.basename(os.path.normpath(ARCHIVE_FOLDER)),
+        *targets
     ]
     try:
-        flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            creationflags=flags,
-            timeout=15,
-            stdin=subprocess.DEVNULL
-        )
-
-        if not result.stdout.strip():
+        try:
+            output = EXIFTOOL.execute(args)
+        except Exception as e:
+            # Fallback: one ExifTool process for this scan only
+            logging.warning(f"⚠️ ExifTool daemon failed ({e}). Falling back to a one-shot scan.")
+            flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            output = subprocess.run(
+                [EXIFTOOL_PATH] + args,
+                capture_output=True,
+                text=True,
+                creationflags=flags,
+                timeout=15,
+                stdin=subprocess.DEVNULL
+            ).stdout
+
+        if not output.strip():
             return []
 
-        meta_list = json.loads(result.stdout)
-
-        archive_abs = os.path.abspath(ARCHIVE_FOLDER)
-        cleaned = []
-        for m in meta_list:
-            src = m.get("SourceFile")
-            if not src:
-                continue
-            if os.path.abspath(src).startswith(archive_abs):
-                continue
-            cleaned.append(m)
-        return cleaned
+        return json.loads(output)
 
     except Exception as e:
         logging.error(f"Metadata scan failed: {e}")
         return []
 
 
+# --- QUICK EXIF (stdlib read of the JPEG headers, no ExifTool) ---
+FFF_CAMERA_INFO = 0x20          # FLIR FFF record type holding the camera identity
+FFF_SERIAL_OFFSET = 0x104       # CameraSerialNumber, string[16], inside that record
+
+
+def _read_ifd(tiff, offset, bo):
+    """{tag: value} for the ASCII and LONG entries of one TIFF IFD."""
+    tags = {}
+    count = int.from_bytes(tiff[offset:offset + 2], bo)
+    for i in range(count):
+        e = offset + 2 + 12 * i
+        if e + 12 > len(tiff):
+            break
+        tag = int.from_bytes(tiff[e:e + 2], bo)
+        typ = int.from_bytes(tiff[e + 2:e + 4], bo)
+        n = int.from_bytes(tiff[e + 4:e + 8], bo)
+        if typ == 2:
+            # ASCII: stored inline when it fits in the 4-byte value field
+            start = e + 8 if n <= 4 else int.from_bytes(tiff[e + 8:e + 12], bo)
+            tags[tag] = tiff[start:start + n].split(b"\0", 1)[0].decode("utf-8", "replace")
+        elif typ == 4:
+            tags[tag] = int.from_bytes(tiff[e + 8:e + 12], bo)
+    return tags
+
+
+def _fff_serial(fff):
+    """CameraSerialNumber from the FLIR FFF CameraInfo record, or None."""
+    if fff[:4] != b"FFF\0":
+        return None
+    # Directory byte order: the format version (100..199) reads sanely in the right one
+    bo = "big" if 100 <= int.from_bytes(fff[0x14:0x18], "big") < 200 else "little"
+    dir_offset = int.from_bytes(fff[0x18:0x1c], bo)
+    for i in range(int.from_bytes(fff[0x1c:0x20], bo)):
+        entry = fff[dir_offset + 32 * i: dir_offset + 32 * (i + 1)]
+        if int.from_bytes(entry[0:2], bo) == FFF_CAMERA_INFO:
+            rec_offset = int.from_bytes(entry[0x0c:0x10], bo)
+            raw = fff[rec_offset + FFF_SERIAL_OFFSET: rec_offset + FFF_SERIAL_OFFSET + 16]
+            serial = raw.split(b"\0", 1)[0].decode("ascii", "replace").strip()
+            return serial or None
+    return None
+
+
+def quick_exif(path):
+    """
+    Reads ImageDescription, DateTimeOriginal and CameraSerialNumber
+    straight from the JPEG's APP1 segments (EXIF + FLIR FFF), stopping
+    at the image data. Returns an ExifTool-shaped dict, or None when
+    something needed is missing, so the caller can ask ExifTool instead.
+    """
+    try:
+        exif, flir_chunks, flir_total = None, {}, None
+        with open(path, 'rb') as fh:
+            if fh.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                header = fh.read(4)
+                if len(header) < 4 or header[0] != 0xFF or header[1] in (0xDA, 0xD9):
+                    break   # start of scan / end of image: no metadata after this
+                segment = fh.read(int.from_bytes(header[2:4], "big") - 2)
+                if header[1] != 0xE1:
+                    continue
+                if segment[:6] == b"Exif\0\0":
+                    exif = segment[6:]
+                elif segment[:5] == b"FLIR\0":
+                    # FLIR\0, 0x01, chunk number, last chunk number, payload
+                    flir_chunks[segment[6]] = segment[8:]
+                    flir_total = segment[7]
+
+        if exif is None or flir_total is None or len(flir_chunks) != flir_total + 1:
+            return None
+
+        bo = "little" if exif[:2] == b"II" else "big"
+        ifd0 = _read_ifd(exif, int.from_bytes(exif[4:8], bo), bo)
+        exif_ifd = _read_ifd(exif, ifd0[0x8769], bo) if 0x8769 in ifd0 else {}
+        taken = exif_ifd.get(0x9003)
+        serial = _fff_serial(b"".join(flir_chunks[i] for i in range(flir_total + 1)))
+        if not taken or not serial:
+            return None
+
+        meta = {
+            "SourceFile": path,
+            "DateTimeOriginal": taken,
+            "CameraSerialNumber": int(serial) if serial.isdigit() else serial,  # -n style
+        }
+        if ifd0.get(0x010E):
+            meta["ImageDescription"] = ifd0[0x010E]
+        return meta
+    except Exception:
+        return None
+
+
 def clean_asset_code(raw_input):
     if not raw_input:
         return None
@@ -180,15 +487,21 @@ def clean_asset_code(raw_input):
 ALEX_LAT = 31.2001
 ALEX_LON = 29.9187
 
-def get_alexandria_weather(dt_obj):
+WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+WEATHER_RETRY_SECONDS = 600     # failed days, and today (still updating), are re-fetched after this
+
+_WEATHER_SESSION = requests.Session()   # keep-alive: one TLS handshake for all days
+_WEATHER_CACHE = {}                     # (date_str, hour) -> temperature_2m
+_DATE_FETCHED = {}                      # date_str -> time.monotonic() of the last attempt
+
+
+def fetch_day_weather(date_str):
     """
-    Fetches the temperature in Alexandria for the specific hour (No Interpolation).
+    Fetches all 24 hourly temperatures of one day in a single request
+    and stores them in the cache.
     """
+    _DATE_FETCHED[date_str] = time.monotonic()
     try:
-        date_str = dt_obj.strftime("%Y-%m-%d")
-        hour_idx = dt_obj.hour  # e.g., 11:43 -> 11
-        
-        url = "https://api.open-meteo.com/v1/forecast"
         params = {
             "latitude": ALEX_LAT,
             "longitude": ALEX_LON,
@@ -197,23 +510,76 @@ def get_alexandria_weather(dt_obj):
             "end_date": date_str,
             "timezone": "auto"
         }
-        
-        response = requests.get(url, params=params, timeout=3)
+        response = _WEATHER_SESSION.get(WEATHER_URL, params=params, timeout=3)
 
         if response.status_code == 200:
             data = response.json()
             if "hourly" in data and "temperature_2m" in data["hourly"]:
-                temps = data["hourly"]["temperature_2m"]
-                
-                # Directly grab the temp for this hour index
-                if 0 <= hour_idx < len(temps):
-                    return float(temps[hour_idx])
-                    
-        return None
+                for hour_idx, temp in enumerate(data["hourly"]["temperature_2m"]):
+                    if temp is not None:
+                        _WEATHER_CACHE[(date_str, hour_idx)] = float(temp)
     except Exception as e:
         logging.error(f"⚠️ Weather API Error: {e}")
-        return None
-    
+
+
+def _weather_needs_fetch(date_str):
+    last = _DATE_FETCHED.get(date_str)
+    if last is None:
+        return True
+    settled = (date_str, 0) in _WEATHER_CACHE and date_str < datetime.now().strftime("%Y-%m-%d")
+    return not settled and time.monotonic() - last > WEATHER_RETRY_SECONDS
+
+
+def prefetch_weather(date_strs):
+    """One API call per distinct day, before any image needs it."""
+    for date_str in sorted(date_strs):
+        if _weather_needs_fetch(date_str):
+            fetch_day_weather(date_str)
+
+
+def get_alexandria_weather(dt_obj):
+    """
+    Returns the temperature in Alexandria for the specific hour (No Interpolation).
+    """
+    date_str = dt_obj.strftime("%Y-%m-%d")
+    if _weather_needs_fetch(date_str):
+        fetch_day_weather(date_str)
+    return _WEATHER_CACHE.get((date_str, dt_obj.hour))  # e.g., 11:43 -> 11
+
+
+# Inferno colormap as a (256, 3) uint8 table, sampled once at startup
+INFERNO_LUT = (matplotlib.colormaps['inferno'](np.linspace(0, 1, 256))[:, :3] * 255).astype(np.uint8)
+
+
+def render_thermal_jpeg(celsius, lo, hi):
+    """
+    Colors the temperature matrix with the inferno LUT and encodes it as JPEG.
+    Same min/max scaling as plt.imsave, without building a Matplotlib figure.
+    lo/hi are the matrix min/max the caller already computed for its stats.
+    """
+    scale = 256.0 / ((hi - lo) or 1.0)
+    idx = np.clip((celsius - lo) * scale, 0, 255).astype(np.uint8)
+    rgb = INFERNO_LUT[idx]
+
+    if _TURBO is not None:
+        # Same quality and 4:2:0 subsampling as the Pillow path below
+        return _TURBO.encode(rgb, quality=75, pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420)
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format='JPEG', quality=75)
+    return buffer.getvalue()
+
+
+def _fast_ts(raw):
+    """
+    "YYYY:MM:DD HH:MM:SS..." or "YYYY-MM-DD HH:MM:SS..." -> datetime (seconds, no tz).
+    Fixed-position slices: no format matching, and no second parse later on.
+    """
+    if len(raw) < 19 or raw[10] != " ":
+        raise ValueError(raw)
+    return datetime(int(raw[0:4]), int(raw[5:7]), int(raw[8:10]),
+                    int(raw[11:13]), int(raw[14:16]), int(raw[17:19]))
+
 
 def process_image(filepath, metadata_entry):
     filename = os.path.basename(filepath)
@@ -230,59 +596,49 @@ def process_image(filepath, metadata_entry):
         raw_ts = str(metadata_entry.get("DateTimeOriginal", ""))
         
         # --- SIMPLE PARSING (No Math, No Conversions) ---
-        # We just take the first 19 characters: "2026:01:21 09:44:47"
-        clean_ts = raw_ts[:19]
-        
+        # We just take the first 19 characters: "2026:01:21 09:44:47" -> 9:44:47
         try:
-            # Create a datetime object for 9:44
-            dt_obj = datetime.strptime(clean_ts, "%Y:%m:%d %H:%M:%S")
+            dt_obj = _fast_ts(raw_ts)
         except ValueError:
-            try:
-                dt_obj = datetime.strptime(clean_ts, "%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                logging.warning(f"⚠️ Date Parse Failed: {raw_ts}. Skipping.")
-                return None
-
-        # 1. Database String: "2026-01-21 09:44:47" (Exactly as seen)
-        ts_str_db = dt_obj.strftime("%Y-%m-%d %H:%M:%S")
-
-        # 2. Weather Check: Uses 9:44 (Correct)
-        weather_temp = get_alexandria_weather(dt_obj)
+            logging.warning("⚠️ Date Parse Failed: %s. Skipping.", raw_ts)
+            return None
 
         # --------------------------------
 
         thermogram = flyr.unpack(filepath)
         celsius = thermogram.celsius
+        params = thermogram.metadata or {}
 
         h, w = celsius.shape
         cy, cx = h // 2, w // 2
 
+        # One reduction each; delta and the JPEG scaling reuse min/max
+        t_max, t_min, t_avg = celsius.max(), celsius.min(), celsius.mean()
+
         row = {
-            "Timestamp": ts_str_db,       # Sent to Dremio as 09:44
+            "Timestamp": dt_obj,          # Sent to Dremio as 09:44
             "Filename": filename,
             "Camera_Serial": serial_int,
             "Asset_Name": asset_str,
-            "Max_Temp_C": round(celsius.max(), 1),
-            "Min_Temp_C": round(celsius.min(), 1),
-            "Avg_Temp_C": round(celsius.mean(), 1),
+            "Max_Temp_C": round(t_max, 1),
+            "Min_Temp_C": round(t_min, 1),
+            "Avg_Temp_C": round(t_avg, 1),
             "Center_Temp_C": round(celsius[cy-1:cy+2, cx-1:cx+2].mean(), 1),
-            "Delta_Temp_C": round(celsius.max() - celsius.min(), 1),
-            "Emissivity": float(metadata_entry.get("Emissivity", 0.95)),
-            "Distance": round(float(metadata_entry.get("ObjectDistance", 1.0)), 1),
-            "weather_temp": weather_temp,
+            "Delta_Temp_C": round(t_max - t_min, 1),
+            # ExifTool values when this file went through it, else flyr's own FFF parse
+            "Emissivity": round(float(metadata_entry.get("Emissivity", params.get("emissivity", 0.95))), 2),
+            "Distance": round(float(metadata_entry.get("ObjectDistance", params.get("object_distance", 1.0))), 1),
+            "weather_temp": None,         # filled in by run_pipeline (network I/O stays out of workers)
             "Image_Base64": ""
         }
 
         # Generate JPEG Buffer
-        buffer = io.BytesIO()
-        plt.imsave(buffer, celsius, cmap='inferno', format='jpeg')
-        buffer.seek(0)
-        row["Image_Base64"] = f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
-        buffer.close()
+        jpeg_bytes = render_thermal_jpeg(celsius, t_min, t_max)
+        row["Image_Base64"] = f"data:image/jpeg;base64,{base64.b64encode(jpeg_bytes).decode('utf-8')}"
 
         return row
     except Exception as e:
-        logging.error(f"Error processing {filename}: {e}")
+        logging.error("Error processing %s: %s", filename, e)
         return None
 
 
@@ -302,40 +658,71 @@ def is_file_locked(filepath):
         return True
 
 
+def path_key(path):
+    """Normalized lookup key for a file path (absolute, case-folded on Windows)."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+# Built once: watcher events inside the archive are ignored with a single startswith
+ARCHIVE_PREFIX = path_key(ARCHIVE_FOLDER) + os.sep
+
+
 def iter_all_jpgs(root_folder):
+    """
+    Yields (full_path, key) for every JPG. Paths from os.walk on an
+    absolute root are already absolute, so nothing is re-normalized.
+    """
     root_abs = os.path.abspath(root_folder)
-    archive_abs = os.path.abspath(ARCHIVE_FOLDER)
+    archive_abs = path_key(ARCHIVE_FOLDER)
 
     for dirpath, dirnames, filenames in os.walk(root_abs):
-        if os.path.abspath(dirpath).startswith(archive_abs):
-            continue
+        # Prune in place so os.walk never descends into the archive
+        dirnames[:] = [d for d in dirnames if os.path.normcase(os.path.join(dirpath, d)) != archive_abs]
         for fname in filenames:
             if fname.lower().endswith(".jpg"):
-                yield os.path.join(dirpath, fname)
+                full_path = os.path.join(dirpath, fname)
+                yield full_path, os.path.normcase(full_path)
+
+
+# path -> (size, mtime) of recent JPGs as of the previous stability pass
+_size_cache = {}
+SETTLE_SECONDS = 2.0
 
 
 def wait_for_folder_stability(root_folder, timeout=15):
     start_time = time.time()
     root_abs = os.path.abspath(root_folder)
-    archive_abs = os.path.abspath(ARCHIVE_FOLDER)
+    archive_abs = path_key(ARCHIVE_FOLDER)
 
     while (time.time() - start_time) < timeout:
         locked_files = []
+        seen = {}
+        now = time.time()
         for dirpath, dirnames, filenames in os.walk(root_abs):
-            if os.path.abspath(dirpath).startswith(archive_abs):
-                continue
+            dirnames[:] = [d for d in dirnames if os.path.normcase(os.path.join(dirpath, d)) != archive_abs]
             for fname in filenames:
                 if not fname.lower().endswith(".jpg"):
                     continue
                 full_path = os.path.join(dirpath, fname)
                 try:
-                    if time.time() - os.path.getmtime(full_path) > 60:
-                        continue
+                    st = os.stat(full_path)
                 except OSError:
                     continue
+                age = now - st.st_mtime
+                if age > 60:
+                    continue
+                sig = (st.st_size, st.st_mtime)
+                seen[full_path] = sig
+                # Settled and unchanged since the last pass: no need to open it again
+                if age > SETTLE_SECONDS and _size_cache.get(full_path) == sig:
+                    continue
                 if is_file_locked(full_path):
                     locked_files.append(full_path)
 
+        # Only paths still present (and recent) are remembered
+        _size_cache.clear()
+        _size_cache.update(seen)
+
         if not locked_files:
             return True
 
@@ -345,29 +732,128 @@ def wait_for_folder_stability(root_folder, timeout=15):
     return False
 
 
+ARCHIVED_NAMES = None    # lower-cased names in ARCHIVE_FOLDER, listed once per run instead of exists() per move
+_COLLISION_IDS = itertools.count(int(time.time()))
+
+
 def move_to_archive(filepath):
+    global ARCHIVED_NAMES
     filename = os.path.basename(filepath)
     src = filepath
-    dst = os.path.join(ARCHIVE_FOLDER, filename)
     try:
-        if os.path.exists(dst):
+        if ARCHIVED_NAMES is None:
+            with os.scandir(ARCHIVE_FOLDER) as it:
+                ARCHIVED_NAMES = {e.name.lower() for e in it}
+        name = filename
+        # os.replace overwrites silently, so same-named files from other subfolders get a unique suffix
+        while name.lower() in ARCHIVED_NAMES:
             base, ext = os.path.splitext(filename)
-            dst = os.path.join(ARCHIVE_FOLDER, f"{base}_{int(time.time())}{ext}")
-        shutil.move(src, dst)
+            name = f"{base}_{next(_COLLISION_IDS)}{ext}"
+        dst = os.path.join(ARCHIVE_FOLDER, name)
+        try:
+            os.replace(src, dst)    # same volume: one atomic rename, no copy
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(src, dst)
+        ARCHIVED_NAMES.add(name.lower())
         return True
     except Exception as e:
-        logging.error(f"❌ Archive Error: {e}")
+        logging.error("❌ Archive Error: %s", e)
         return False
 
 
+# --- BACKGROUND ARCHIVER (file moves overlap with decoding and DB work) ---
+ARCHIVE_Q = queue.Queue(maxsize=1024)
+_ARCHIVER = None
+
+
+def archive_worker():
+    """Moves queued files to the archive until the None sentinel arrives."""
+    while True:
+        fpath = ARCHIVE_Q.get()
+        try:
+            if fpath is None:
+                return
+            move_to_archive(fpath)
+        finally:
+            ARCHIVE_Q.task_done()
+
+
+def start_archiver():
+    global _ARCHIVER
+    _ARCHIVER = threading.Thread(target=archive_worker, daemon=True)
+    _ARCHIVER.start()
+
+
+def archive_later(fpath):
+    """Queues a move for the archiver thread (moves inline if it isn't running)."""
+    if _ARCHIVER is None:
+        move_to_archive(fpath)
+    else:
+        ARCHIVE_Q.put(fpath)
+
+
+def stop_archiver():
+    """Lets the archiver drain everything queued, then stops it."""
+    if _ARCHIVER is not None and _ARCHIVER.is_alive():
+        ARCHIVE_Q.put(None)
+        _ARCHIVER.join(timeout=30)
+
+
 # ==============================================================================
 # SECTION 3: PIPELINE LOGIC (WITH DUPLICATE FIX)
 # ==============================================================================
 
-def run_pipeline(db_engine):
+def decode_chunk(chunk):
+    """
+    Yields (path, row) for each file as it finishes. Decode/stats/JPEG are
+    CPU-bound and independent per file, so they fan out to the pool; without
+    one (not started as __main__) files are decoded in-process. A dead worker
+    surfaces as BrokenProcessPool for the caller to handle.
+    """
+    if _POOL is None:
+        for fpath, m_data in chunk:
+            yield fpath, process_image(fpath, m_data)
+        return
+
+    futures = {_POOL.submit(process_image, fpath, m_data): fpath for fpath, m_data in chunk}
+    for future in as_completed(futures):
+        fpath = futures[future]
+        try:
+            row = future.result()
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            # e.g. the result could not be sent back: leave the file for the next run
+            logging.error("❌ Worker failed on %s: %s", os.path.basename(fpath), e)
+            continue
+        yield fpath, row
+
+
+def run_pipeline(db_engine, upload_table):
+    global ARCHIVED_NAMES
     logging.info("🔄 Starting Pipeline Run...")
 
-    meta_list = get_metadata(INPUT_FOLDER)
+    # Moves queued by the previous run must land first, or this scan would see those files again
+    if _ARCHIVER is not None:
+        ARCHIVE_Q.join()
+    ARCHIVED_NAMES = None   # re-list the archive lazily, in case it was cleaned up between runs
+
+    # Fast path: read the dedup tags ourselves; ExifTool only sees files we couldn't parse
+    all_jpgs = list(iter_all_jpgs(INPUT_FOLDER))
+    meta_list = []
+    unparsed = []
+    for full_path, _ in all_jpgs:
+        m = quick_exif(full_path)
+        if m:
+            meta_list.append(m)
+        else:
+            unparsed.append(full_path)
+    if unparsed:
+        # Very long file lists would overflow the one-shot fallback's command line
+        meta_list.extend(get_metadata(unparsed if len(unparsed) <= 100 else [INPUT_FOLDER]))
+
     if not meta_list:
         logging.info("   ℹ️ No readable images found.")
         return
@@ -377,9 +863,7 @@ def run_pipeline(db_engine):
     timestamps = []
     for m in meta_list:
         if 'SourceFile' in m:
-            src = m['SourceFile']
-            full_src = os.path.abspath(src)
-            meta_dict[full_src] = m
+            meta_dict[path_key(m['SourceFile'])] = m
             if 'DateTimeOriginal' in m:
                 timestamps.append(str(m['DateTimeOriginal']).replace(":", "-", 2))
 
@@ -398,10 +882,10 @@ def run_pipeline(db_engine):
 
     # 3. Collect files (Checking against DB AND Current Batch)
     files_to_process = []
+    weather_dates = set()
 
-    for fpath in iter_all_jpgs(INPUT_FOLDER):
-        full_path = os.path.abspath(fpath)
-        m_data = meta_dict.get(full_path, {})
+    for full_path, key in all_jpgs:
+        m_data = meta_dict.get(key, {})
 
         raw_asset = m_data.get("ImageDescription", "")
         asset = clean_asset_code(raw_asset)
@@ -413,21 +897,25 @@ def run_pipeline(db_engine):
         except Exception:
             serial = 0
 
-        # Define the unique signature for this image
-        current_sig = (asset, ts, serial)
+        # Define the unique signature for this image: (asset, day) bucket + (time, serial)
+        day_key = (asset, ts[:10])
+        current_sig = (ts[11:19], serial)
 
         # CHECK SIGNATURE: Is it in DB? OR Is it in current processing batch?
-        if asset and ts and current_sig in existing:
-            logging.info(f"   ⚠️ Duplicate: {os.path.basename(fpath)} -> Archiving...")
-            move_to_archive(full_path)
+        # (.get so a miss doesn't create an empty bucket)
+        if asset and ts and current_sig in existing.get(day_key, ()):
+            logging.info("   ⚠️ Duplicate: %s -> Archiving...", os.path.basename(full_path))
+            archive_later(full_path)
         else:
-            files_to_process.append(full_path)
+            files_to_process.append((full_path, m_data))
+            if ts:
+                weather_dates.add(ts[:10])
             
             # --- CRITICAL FIX: Add to 'existing' IMMEDIATELY ---
             # This prevents the loop from accepting a copy of this same file 
             # (e.g. "FLIR0030 (1).jpg") later in the same batch.
             if asset and ts:
-                existing.add(current_sig)
+                existing[day_key].add(current_sig)
 
     if not files_to_process:
         logging.info("✅ No new data to upload.")
@@ -435,59 +923,47 @@ def run_pipeline(db_engine):
 
     logging.info(f"🚀 Processing {len(files_to_process)} NEW images...")
 
+    # One weather request per day instead of one per image
+    prefetch_weather(weather_dates)
+
     # 4. Process, Upload, and Archive
     total_uploaded = 0
 
-    sql_types = {
-        "Timestamp": DateTime(),
-        "Filename": String(255),
-        "Camera_Serial": Integer(),
-        "Asset_Name": String(255),
-        "Max_Temp_C": Float(),
-        "Min_Temp_C": Float(),
-        "Center_Temp_C": Float(),
-        "Avg_Temp_C": Float(),
-        "Delta_Temp_C": Float(),
-        "Emissivity": Float(),
-        "Distance": Float(),
-        "weather_temp": Float(),
-        "Image_Base64": Text()
-    }
-
     for i in range(0, len(files_to_process), BATCH_SIZE):
         chunk = files_to_process[i: i + BATCH_SIZE]
         new_rows = []
         uploaded_paths = []
+        pool_broken = False
 
-        for fpath in chunk:
-            m_data = meta_dict.get(os.path.abspath(fpath), {})
-            row = process_image(fpath, m_data)
-
-            if row:
-                new_rows.append(row)
-                uploaded_paths.append(fpath)
-            else:
-                logging.warning(f"⚠️ No Asset Note found for {os.path.basename(fpath)}. Archiving without upload.")
-                move_to_archive(fpath)
+        try:
+            for fpath, row in decode_chunk(chunk):
+                if row:
+                    # Weather Check: uses the photo's own hour (e.g. 9:44 -> 9)
+                    row["weather_temp"] = get_alexandria_weather(row["Timestamp"])
+                    new_rows.append(row)
+                    uploaded_paths.append(fpath)
+                else:
+                    logging.warning("⚠️ No Asset Note found for %s. Archiving without upload.", os.path.basename(fpath))
+                    archive_later(fpath)
+        except BrokenProcessPool as e:
+            # A worker was killed (native crash, OOM): undecoded files stay in the folder for the next run
+            logging.error("❌ Decode worker died (%s). Restarting the pool and skipping the rest of this run.", e)
+            start_pool()
+            pool_broken = True
 
         if new_rows:
-            df = pd.DataFrame(new_rows)
-            cols = [
-                "Timestamp", "Filename", "Camera_Serial", "Asset_Name",
-                "Max_Temp_C", "Min_Temp_C", "Center_Temp_C", "Avg_Temp_C",
-                "Delta_Temp_C", "Emissivity", "Distance", "weather_temp", "Image_Base64"
-            ]
-            df = df[cols]
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='mixed').dt.tz_localize(None)
-
             try:
-                df.to_sql(DB_TABLE, db_engine, if_exists='append', index=False, dtype=sql_types)
-                total_uploaded += len(df)
+                # Row dicts go straight to the DB: no DataFrame in between
+                upload_rows(db_engine, upload_table, new_rows)
+                total_uploaded += len(new_rows)
                 for fpath in uploaded_paths:
-                    move_to_archive(fpath)
+                    archive_later(fpath)
             except Exception as e:
                 logging.error(f"❌ Chunk Upload Failed: {e}")
 
+        if pool_broken:
+            break
+
     if total_uploaded > 0:
         logging.info(f"🎉 SUCCESS: Uploaded {total_uploaded} records & Archived.")
 
@@ -496,15 +972,63 @@ def run_pipeline(db_engine):
 # SECTION 4: EVENT LISTENERS & MAIN LOOP
 # ==============================================================================
 
+# --- TRIGGER COALESCING ---
+DEBOUNCE_SECONDS = 2.0          # a sync burst becomes one run, this long after its last file
+PIPELINE_LOCK = threading.Lock()
+_PENDING = threading.Event()    # a trigger arrived while a run was active
+_DEBOUNCE_TIMER = None
+_TIMER_LOCK = threading.Lock()
+
+
+def request_run():
+    """Asks for one pipeline run; during an active run it only marks one more as pending."""
+    if PIPELINE_LOCK.locked():
+        _PENDING.set()
+    else:
+        TRIGGER_EVENT.set()
+
+
+def schedule_run():
+    """
+    (Re)starts the debounce timer. Returns True when this event
+    opened a new burst (no timer was waiting yet).
+    """
+    global _DEBOUNCE_TIMER
+    with _TIMER_LOCK:
+        new_burst = _DEBOUNCE_TIMER is None or not _DEBOUNCE_TIMER.is_alive()
+        if _DEBOUNCE_TIMER is not None:
+            _DEBOUNCE_TIMER.cancel()
+        _DEBOUNCE_TIMER = threading.Timer(DEBOUNCE_SECONDS, request_run)
+        _DEBOUNCE_TIMER.daemon = True
+        _DEBOUNCE_TIMER.start()
+    return new_burst
+
+
+def run_coalesced(db_engine, upload_table):
+    """
+    Runs the pipeline, then once more if triggers arrived meanwhile;
+    never two runs at the same time.
+    """
+    while True:
+        with PIPELINE_LOCK:
+            _PENDING.clear()
+            if wait_for_folder_stability(INPUT_FOLDER):
+                run_pipeline(db_engine, upload_table)
+            else:
+                logging.error("❌ Folder locked. Skipping.")
+        if not _PENDING.is_set():
+            return
+
+
 class FileTrigger(FileSystemEventHandler):
     def _trigger(self, path):
         if not path.lower().endswith(".jpg"):
             return
-        if os.path.abspath(path).startswith(os.path.abspath(ARCHIVE_FOLDER)):
+        if path_key(path).startswith(ARCHIVE_PREFIX):
             return
-        print("-------------------------------------------------------")
-        logging.info("⏳ New file detected.")
-        TRIGGER_EVENT.set()
+        if schedule_run():
+            print("-------------------------------------------------------")
+            logging.info("⏳ New file detected.")
 
     def on_created(self, event):
         if not event.is_directory:
@@ -521,7 +1045,7 @@ def keyboard_listener():
             input()
             print("-------------------------------------------------------")
             logging.info("⌨️ Manual trigger detected.")
-            TRIGGER_EVENT.set()
+            request_run()
         except EOFError:
             break
 
@@ -532,10 +1056,15 @@ def shutdown_handler(db_engine):
         db_engine.dispose()
     except Exception:
         pass
+    EXIFTOOL.close()
+    stop_archiver()
+    if _POOL is not None:
+        _POOL.shutdown(cancel_futures=True)
     logging.info("👋 Goodbye.")
 
 
 if __name__ == "__main__":
+    setup_logging()
     print("-------------------------------------------------------")
     logging.info("🛠️  Performing Startup Health Check...")
 
@@ -551,13 +1080,19 @@ if __name__ == "__main__":
         db_engine = init_db_engine()
         atexit.register(shutdown_handler, db_engine)
 
+        # Also leaves the first pooled connection open for the initial run
         with db_engine.connect() as conn:
             logging.info(f"✅ Database Connected to Table: {DB_NAME}.{DB_TABLE}")
+        threading.Thread(target=db_keepalive, args=(db_engine,), daemon=True).start()
+        upload_table = init_upload_table(db_engine)
     except Exception as e:
         logging.error(f"❌ CRITICAL DB ERROR: {e}")
         exit()
 
-    run_pipeline(db_engine)
+    start_pool()
+    start_archiver()
+
+    run_coalesced(db_engine, upload_table)
 
     observer = Observer()
     observer.schedule(FileTrigger(), INPUT_FOLDER, recursive=True)
@@ -568,13 +1103,10 @@ if __name__ == "__main__":
 
     try:
         while True:
-            if TRIGGER_EVENT.wait(timeout=1):
-                time.sleep(1)
+            # The debounce timer already waited for the burst to end: no extra sleep here
+            if TRIGGER_EVENT.wait(timeout=1) or _PENDING.is_set():
                 TRIGGER_EVENT.clear()
-                if wait_for_folder_stability(INPUT_FOLDER):
-                    run_pipeline(db_engine)
-                else:
-                    logging.error("❌ Folder locked. Skipping.")
+                run_coalesced(db_engine, upload_table)
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
\ No newline at end of file